@@ -15,12 +15,14 @@ Implementation and specification by the mighty Alastair Horn.
 """
 
 import string
-import collections
 
 import argparse
 
+from bisect import bisect_left
+
 from perm import Perm
-from cipher_streamer import CipherStreamer, chunk, BLOCK_DEFAULT, WIDTH_DEFAULT
+from cipher_streamer import (CipherStreamer, BLOCK_DEFAULT,
+                             WIDTH_DEFAULT, WRITE_SIZE)
 from util import strip_punc
 
 
@@ -28,34 +30,62 @@ from util import strip_punc
 def autoperm_encipher(plaintext, sigma, tau):
     """
     Encrypt
+
+    Rather than composing Perm objects for every pair (which builds a whole new
+    mapping each time), this works on flat copies of the mappings which are
+    updated in place. Composing on the right with the transposition (a b) just
+    swaps the images of a and b.
     """
-    for a, b in chunk(plaintext, 2):
-        if b is None:
-            yield sigma[a]
+    sigma = dict(sigma.mapping)
+    tau = dict(tau.mapping)
+    letters = iter(plaintext)
+    for a in letters:
+        # pair a up with the next letter, if there is one. This is quite a bit
+        # cheaper than chunk(), as there are no tuples or fill values.
+        for b in letters:
+            yield sigma.get(a, a)
+            yield tau.get(b, b)
+            sigma[a], sigma[b] = sigma.get(b, b), sigma.get(a, a)
+            tau[a], tau[b] = tau.get(b, b), tau.get(a, a)
+            break
         else:
-            yield from (sigma[a], tau[b])
-            transposition = Perm.from_cycle([a, b])
-            sigma *= transposition
-            tau *= transposition
+            yield sigma.get(a, a)
 
 
 @CipherStreamer
 def autoperm_decipher(ciphertext, sigma, tau):
     """
     Decrypt
+
+    Like autoperm_encipher, this updates flat copies of the mappings in place.
+    Composing the inverse on the left with the transposition (a b) swaps the
+    preimages of a and b, which are just the images under the forward mapping.
+    So both directions are kept, and the forward one is updated just like when
+    enciphering.
     """
-    sigma_inverse = sigma.inverse()
-    tau_inverse = tau.inverse()
-    for a, b in chunk(ciphertext, 2):
-        if b is None:
-            yield sigma_inverse[a]
+    sigma_inverse = dict(sigma.inverse().mapping)
+    tau_inverse = dict(tau.inverse().mapping)
+    sigma = dict(sigma.mapping)
+    tau = dict(tau.mapping)
+    letters = iter(ciphertext)
+    for a in letters:
+        # see autoperm_encipher
+        for b in letters:
+            a_plain = sigma_inverse.get(a, a)
+            b_plain = tau_inverse.get(b, b)
+            yield a_plain
+            yield b_plain
+            a_pre = sigma.get(a_plain, a_plain)
+            b_pre = sigma.get(b_plain, b_plain)
+            sigma_inverse[a_pre], sigma_inverse[b_pre] = b_plain, a_plain
+            sigma[a_plain], sigma[b_plain] = b_pre, a_pre
+            a_pre = tau.get(a_plain, a_plain)
+            b_pre = tau.get(b_plain, b_plain)
+            tau_inverse[a_pre], tau_inverse[b_pre] = b_plain, a_plain
+            tau[a_plain], tau[b_plain] = b_pre, a_pre
+            break
         else:
-            a_plain = sigma_inverse[a]
-            b_plain = tau_inverse[b]
-            yield from (a_plain, b_plain)
-            transposition = Perm.from_cycle([a_plain, b_plain])
-            sigma_inverse = transposition * sigma_inverse
-            tau_inverse = transposition * tau_inverse
+            yield sigma_inverse.get(a, a)
 
 
 def permutation_from_key(key):
@@ -73,22 +103,22 @@ def permutation_from_key(key):
     this)
 
     This function generously strips any punctuation and makes the string
-    uppercase, so should be fairly robust on any input.
+    uppercase, so should be fairly robust on any input. Letters outside of A-Z
+    can't be permuted, so they are ignored too.
     """
     mapping = {}
-    alphabet = set(string.ascii_uppercase)
     from_iterable = iter(string.ascii_uppercase)
-    # use an OrderedDict so as to retain compatibility with 3.6 spec
-    key_unique = "".join(collections.OrderedDict.fromkeys(strip_punc(key)))
+    # dicts preserve insertion order (guaranteed since 3.7)
+    key_unique = "".join(dict.fromkeys(
+            c for c in strip_punc(key) if c in string.ascii_uppercase))
     # in case of empty key (although that's not a good idea)
     k = 'A'
     for k, a in zip(key_unique, from_iterable):
         mapping[a] = k
-        alphabet.remove(k)
-    alphabet = sorted(alphabet)
-    start_index = 0
-    while start_index < len(alphabet) and alphabet[start_index] < k:
-        start_index += 1
+    # the rest of the alphabet, which comes out already sorted
+    alphabet = [a for a in string.ascii_uppercase if a not in key_unique]
+    # start from the first remaining letter after the last one in the key
+    start_index = bisect_left(alphabet, k)
     for ind, k in enumerate(from_iterable):
         mapping[k] = alphabet[(start_index + ind) % len(alphabet)]
     return Perm(mapping)
@@ -105,7 +135,8 @@ def get_args():
             "in_file", type=argparse.FileType("r"), default="-", nargs="?",
             help="Input file (plaintext or ciphertext)")
     parser.add_argument(
-            "out_file", type=argparse.FileType("w"), default="-", nargs="?",
+            "out_file", type=argparse.FileType("w", bufsize=WRITE_SIZE),
+            default="-", nargs="?",
             help="Output file (plaintext or ciphertext)")
     key = parser.add_mutually_exclusive_group(required=True)
     key.add_argument(
@@ -4,13 +4,19 @@
 Cipher streamer class
 """
 
+import re
 import itertools
 
-from util import file_chars, strip_punc
+from util import strip_punc
 
 # Block default of 4 makes much more sense :P
 BLOCK_DEFAULT = 4
 WIDTH_DEFAULT = 80
+# Number of characters to collect before writing them out
+WRITE_SIZE = 1 << 16
+# For splitting ASCII text into words. The group means that re.split keeps the
+# words, so they alternate with the punctuation between them.
+ASCII_WORD_RE = re.compile("([A-Za-z]+)")
 
 
 def chunk(iterable, size, fillvalue=None):
@@ -30,7 +36,29 @@ def get_lines(iterable, block, width):
 
     It is *excruciatingly* lazy, to the point of illegibility. But I think it's
     fun :).
+
+    If the whole text is already there as a string though, it's much faster to
+    just cut it up with slicing, so that's what happens.
     """
+    if isinstance(iterable, str):
+        if block <= 0:
+            if width <= 0:
+                lines = [iterable]
+            else:
+                lines = [iterable[i:i + width]
+                         for i in range(0, len(iterable), width)]
+        else:
+            blocks = [iterable[i:i + block]
+                      for i in range(0, len(iterable), block)]
+            if width <= 0:
+                lines = [" ".join(blocks)]
+            else:
+                if width < block:
+                    raise ValueError("`width` should be >= `block`")
+                blocks_per_line = (width + 1) // (block + 1)
+                lines = [" ".join(blocks[i:i + blocks_per_line])
+                         for i in range(0, len(blocks), blocks_per_line)]
+        return (line.strip() for line in lines)
     # Each of the four cases is expected to produce an iterable `lines`,
     # consisting of iterables of strings to be joined and written as lines to
     # out_file.
@@ -61,11 +89,52 @@ def get_lines(iterable, block, width):
     return ("".join(line).strip() for line in lines)
 
 
+def write_batched(out_file, pieces, size=WRITE_SIZE):
+    """
+    Write an iterable of strings to a file, joining them together so that each
+    write is (apart from the last) at least `size` characters. Calling write for
+    every little string is surprisingly slow.
+    """
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            out_file.write("".join(buffer))
+            buffer.clear()
+            buffered = 0
+    out_file.write("".join(buffer))
+
+
+def match_case(text, pattern):
+    """
+    Make each character of `text` uppercase if the corresponding character of
+    `pattern` is uppercase, and lowercase otherwise. `text` shouldn't be longer
+    than `pattern`.
+
+    The common cases of ASCII words which are all one case or title case are
+    handled by converting the whole thing at once.
+    """
+    if pattern.isascii():
+        if pattern.isupper():
+            return text.upper()
+        if pattern.islower():
+            return text.lower()
+        if pattern.istitle():
+            return text[:1].upper() + text[1:].lower()
+    return "".join(c.upper() if p.isupper() else c.lower()
+                   for c, p in zip(text, pattern))
+
+
 class CipherStreamer:
     """
-    Context to stream a file object through a function and write it to an
-    output, exposing the input as only uppercase letters. This class can handle
-    case correction and punctuation, if the caller wants it to.
+    Context to pass the contents of a file object through a function and write
+    it to an output, exposing the input as only uppercase letters. This class
+    can handle case correction and punctuation, if the caller wants it to.
+
+    The input file is read in full before anything is written, so reading from
+    stdin needs to reach EOF before there is any output.
 
     This is implemented as a decorator, that takes the arguments `in_file` and
     `out_file`, a readable and writeable file respectively. A keyword argument
@@ -124,37 +193,46 @@ class CipherStreamer:
 
         If it is passed `lowercase=True`, output it lowercase rather than
         uppercase.
+
+        The whole input is read in one go, so nothing is written until in_file
+        reaches EOF.
         """
         if compare and 0 < width <= 2:
             raise ValueError("width should be > 2 in compare mode")
-        input_chars = strip_punc(file_chars(in_file))
-        if compare:
-            input_chars, plaintext = itertools.tee(input_chars)
-        output = self.func(input_chars, *args, **kwargs)
-        if compare:
-            lines = get_lines(output, block, width - 2)
-        else:
-            lines = get_lines(output, block, width)
-        if lowercase:
-            post_func = lambda s: "{}\n".format(s.lower())
-        else:
-            post_func = lambda s: "{}\n".format(s.upper())
+        # read and strip the input all in one go. It's then just a string, so
+        # can be iterated over again for compare mode.
+        input_chars = strip_punc(in_file.read())
+        # collect the output into a string so that get_lines can slice it up
+        output = "".join(self.func(input_chars, *args, **kwargs))
+        case_func = str.lower if lowercase else str.upper
+
+        def format_lines(text, line_width):
+            # Change the case only once the text has been cut up into lines, as
+            # some case mappings change the length of the text (eg "İ".lower()
+            # is two characters), which would throw the blocks off. It's still
+            # done to all the lines in one go, though.
+            lines = list(get_lines(text, block, line_width))
+            # joining and splitting would turn no lines into one empty line
+            if not lines:
+                return lines
+            return case_func("\n".join(lines)).split("\n")
+
         if compare:
-            plain_lines = get_lines(plaintext, block, width - 2)
-            for line, plain in itertools.zip_longest(lines, plain_lines,
-                                                     fillvalue=""):
-                out_file.write("i:{}".format(post_func(plain)))
-                out_file.write("o:{}".format(post_func(line)))
-                out_file.write("\n")
+            lines = format_lines(output, width - 2)
+            plain_lines = format_lines(input_chars, width - 2)
+            pieces = ("i:{}\no:{}\n\n".format(plain, line)
+                      for line, plain in itertools.zip_longest(
+                          lines, plain_lines, fillvalue=""))
         else:
-            for line in lines:
-                out_file.write(post_func(line))
-
-    # TODO: do this better (more lazily), with itertools or something. As it
-    #       stands this could easily just be written as a function returning a
-    #       closure.
-    #       I think we have to ask for func to be implemented as a coroutine to
-    #       do this nicely
+            pieces = ("{}\n".format(line)
+                      for line in format_lines(output, width))
+        write_batched(out_file, pieces)
+
+    # TODO: make this lazy again, so that output can start before the end of the
+    #       input (eg for stdin). The whole input is currently read in one go,
+    #       because that is much faster for the files this is used on. Doing it
+    #       nicely would probably mean asking for func to be implemented as a
+    #       coroutine.
     def preserve(self, in_file, out_file, *args, **kwargs):
         """
         Restore punctuation and case after the generator.
@@ -166,21 +244,45 @@ class CipherStreamer:
         This is useful because for instance it means that the last trailing
         newline (which is present in any file made by a sane person) will be
         written as output.
+
+        The whole input is read in one go (so nothing is written until in_file
+        reaches EOF) and split up into its words (runs of letters) and the
+        punctuation between them, and the case of the output is fixed up a word
+        at a time.
         """
-        in_file_1, in_file_2 = itertools.tee(file_chars(in_file))
-        output = self.func(strip_punc(in_file_1), *args, **kwargs)
-        for c in output:
-            punc = ' '
-            for punc in in_file_2:
-                if punc.isalpha():
-                    break
-                out_file.write(punc)
-            if not punc.isalpha():
-                out_file.write(c)
-            elif punc.isupper():
-                out_file.write(c.upper())
-            else:
-                out_file.write(c.lower())
-        for punc in in_file_2:
-            if not punc.isalpha():
-                out_file.write(punc)
+        text = in_file.read()
+        # puncts[i] is the punctuation preceding words[i], and the last one is
+        # whatever follows the last word.
+        if text.isascii():
+            # a regex can do all the work in one go here
+            parts = ASCII_WORD_RE.split(text)
+            words = parts[1::2]
+            puncts = parts[0::2]
+        else:
+            words = []
+            puncts = [""]
+            for is_alpha, run in itertools.groupby(text, str.isalpha):
+                if is_alpha:
+                    words.append("".join(run))
+                    puncts.append("")
+                else:
+                    puncts[-1] = "".join(run)
+        letters = "".join(words)
+        stripped = strip_punc(letters)
+        output = "".join(self.func(stripped, *args, **kwargs))
+        if len(stripped) != len(letters):
+            # some letters get longer when made uppercase (eg "ß" -> "SS"), so
+            # stretch each word to match, repeating those letters so their case
+            # carries over to every output letter they turned into
+            words = ["".join(c * len(c.upper()) for c in word)
+                     for word in words]
+        pieces = []
+        position = 0
+        for punc, word in zip(puncts, words):
+            pieces.append(punc)
+            pieces.append(match_case(output[position:position + len(word)],
+                                     word))
+            position += len(word)
+        pieces.append(puncts[-1])
+        pieces.append(output[position:])
+        write_batched(out_file, pieces)
@@ -17,6 +17,8 @@ from util import strip_punc
 BEE_MOVIE_PATH = Path(__file__).parent / ".." / "texts" / "beemovie.txt"
 with BEE_MOVIE_PATH.open("r") as f:
     BEE_MOVIE = f.read()
+# stripping is the same every time, so might as well only do it once
+BEE_MOVIE_STRIPPED = strip_punc(BEE_MOVIE)
 
 
 def blind_distribution(dist):
@@ -37,6 +39,22 @@ def normalise(dist):
     return {k: v / total for k, v in dist.items()}
 
 
+def letter_counts(text):
+    """
+    Count how many times each character occurs in some text, like
+    collections.Counter (and only including characters which do occur).
+
+    Stripped text is almost always just A-Z, in which case it's a lot quicker to
+    run str.count for each letter than to build up a Counter. If that doesn't
+    account for every character in the text, this falls back to a Counter.
+    """
+    if isinstance(text, str):
+        counts = {c: text.count(c) for c in string.ascii_uppercase}
+        if sum(counts.values()) == len(text):
+            return {c: n for c, n in counts.items() if n}
+    return collections.Counter(text)
+
+
 # re-normalise it, to make the total expected frequency be much closer to 1.
 # This kind of dubiously modifies the frequencies (although they stay in the
 # same ratios), but really it is kind of necessary to make later statistical
@@ -62,15 +80,19 @@ def chi_squared(observed_dist, expected_dist):
     an item with probability 0 appears a nonzero number of times as an observed
     value, infinity is returned.
     """
-    all_entries = set(observed_dist) | set(expected_dist)
-    # this is probably mathematically and programmatically bad. But basically in
-    # the case where o = e = 0, I just want (o - e) ** 2 / e to be 0, since
-    # there is no contribution of this point. if that makes any sense.
-    # Anyway, 0^2 / 0 == 0, just ask a differential equations lecturer
-    my_div = lambda a, b: 0 if a == 0 else inf if b == 0 else a / b
-    return sum(my_div((o - e) ** 2, e) for o, e in
-                ((d.get(i, 0) for d in (observed_dist, expected_dist))
-                    for i in all_entries))
+    # Anything observed which wasn't expected at all makes the result infinite
+    # (unless it was observed 0 times, in which case there's no contribution).
+    # This is checked first, so the main sum only has to go over the expected
+    # entries.
+    if any(o != 0 and not expected_dist.get(i, 0)
+           for i, o in observed_dist.items()):
+        return inf
+    # Now wherever e = 0, o = 0 too, and I just want (o - e) ** 2 / e to be 0,
+    # since there is no contribution of this point. 0^2 / 0 == 0, just ask a
+    # differential equations lecturer
+    observed_get = observed_dist.get
+    return sum((observed_get(i, 0) - e) ** 2 / e
+               for i, e in expected_dist.items() if e != 0)
 
 
 class Metric:
@@ -102,7 +124,9 @@ class Metric:
         """
         Compute the metric for some randomly generated characters
         """
-        return self(random.choice(string.ascii_uppercase) for _ in range(num))
+        # these are already just uppercase letters, so there's no need to strip
+        return self.no_strip(
+                "".join(random.choices(string.ascii_uppercase, k=num)))
 
     def english(self):
         """
@@ -110,7 +134,7 @@ class Metric:
 
         Namely, the bee movie script.
         """
-        return self(BEE_MOVIE)
+        return self.no_strip(BEE_MOVIE_STRIPPED)
 
 
 @Metric
@@ -123,7 +147,7 @@ def ioc(text, domain_size=26):
     ioc.no_strip())
     """
     # Maps letters to how many times they occur.
-    letters = collections.Counter(text)
+    letters = letter_counts(text)
     # We need to find out how long the text is
     length = sum(letters.values())
     # special case when length is too small for IOC to be defined
@@ -146,7 +170,7 @@ def frequency_goodness_of_fit(text):
     own risk).
     """
     # Maps letters to their frequencies
-    letter_dist = normalise(collections.Counter(text))
+    letter_dist = normalise(letter_counts(text))
     return chi_squared(letter_dist, ENGLISH_FREQUENCIES)
 
 
@@ -157,7 +181,7 @@ def blind_frequency_fit(text):
     applied to any kind of simple polyalphabetic monograph substitution cipher,
     for instance (eg Vigenère, Caesar, keyword substitution, Beaufort...)
     """
-    letter_dist = normalise(collections.Counter(text))
+    letter_dist = normalise(letter_counts(text))
     return chi_squared(blind_distribution(letter_dist),
                        SORTED_ENGLISH_FREQUENCIES)
 
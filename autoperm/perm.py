@@ -6,6 +6,9 @@ Permutation class
 
 import random
 
+from math import gcd
+from functools import reduce
+
 
 class Perm:
     """
@@ -21,6 +24,9 @@ class Perm:
     and you've given it a mapping that is a bijection. If you can't be sure,
     feel free to check with .is_permutation().
     """
+    # Lots of these get made, so don't give each one a __dict__
+    __slots__ = ("mapping", "_translation", "_inverse", "_cycles")
+
     # I know what I'm doing:
     # pylint: disable=dangerous-default-value
     def __init__(self, mapping={}):
@@ -29,6 +35,12 @@ class Perm:
         argument, returns an identity permutation.
         """
         self.mapping = mapping
+        # table for str.translate, built the first time it's needed
+        self._translation = None
+        # likewise the inverse permutation
+        self._inverse = None
+        # and the disjoint cycles, as tuples so that callers can't mutate them
+        self._cycles = None
 
     @classmethod
     def from_cycle(cls, cycle):
@@ -80,28 +92,42 @@ class Perm:
         """
         return set(self.mapping.keys()) == set(self.mapping.values())
 
+    def cycles(self):
+        """
+        The disjoint cycle decomposition as a tuple of tuples, in no particular
+        order and without 1-cycles. This is only computed once, so prefer it
+        over disjoint_cycle_decomposition_unstable when you only need to read
+        the cycles.
+        """
+        if self._cycles is None:
+            # use a set for amortised O(1) lookup.
+            remaining = set(self.mapping)
+            # everything in a cycle is in the domain (this is a bijection), so
+            # index the mapping directly rather than going through __getitem__
+            mapping = self.mapping
+            decomposition = []
+            while remaining:
+                a = remaining.pop()
+                cycle = [a]
+                b = mapping[a]
+                # this could of course be done beautifully with the walrus
+                # operator, but I'm trying to keep my Ubuntu-using fans happy
+                while b != a:
+                    remaining.remove(b)
+                    cycle.append(b)
+                    b = mapping[b]
+                if len(cycle) > 1:
+                    decomposition.append(tuple(cycle))
+            self._cycles = tuple(decomposition)
+        return self._cycles
+
     def disjoint_cycle_decomposition_unstable(self):
         """
         Get a list of lists which is the disjoint cycle decomposition. _DON'T_
         include 1-cycles, so that more can be inferred about cycle types across
         different domains from this decomposition.
         """
-        # use a set for amortised O(1) lookup.
-        remaining = set(self.mapping)
-        decomposition = []
-        while remaining:
-            a = remaining.pop()
-            cycle = [a]
-            b = self[a]
-            # this could of course be done beautifully with the walrus operator,
-            # but I'm trying to keep my Ubuntu-using fans happy
-            while b != a:
-                remaining.remove(b)
-                cycle.append(b)
-                b = self[b]
-            if len(cycle) > 1:
-                decomposition.append(cycle)
-        return decomposition
+        return list(map(list, self.cycles()))
 
     def disjoint_cycle_decomposition_stable(self, key=lambda x: x):
         """
@@ -124,12 +150,10 @@ class Perm:
         """
         decomposition = self.disjoint_cycle_decomposition_unstable()
         for cycle in decomposition:
-            min_index = min(((i, ind) for ind, i in enumerate(cycle)),
-                            key=key)[1]
-            # I'm not sure if this is faster than slicing or not, but I
-            # marginally prefer the feeling of not building intermediate lists.
-            cycle[:] = [cycle[(min_index + i) % len(cycle)]
-                    for i in range(len(cycle))]
+            min_index = min(range(len(cycle)), key=lambda ind: key(cycle[ind]))
+            # slicing turns out to be quite a bit faster than building the
+            # rotated list one (modular) index at a time
+            cycle[:] = cycle[min_index:] + cycle[:min_index]
         decomposition.sort(key=lambda cycle: key(cycle[0]))
         decomposition.sort(key=len)
         return decomposition
@@ -137,8 +161,14 @@ class Perm:
     def inverse(self):
         """
         Create the inverse of a permutation
+
+        This is only computed once, and the inverse remembers that its inverse
+        is this permutation.
         """
-        return type(self)({v: k for k, v in self.mapping.items()})
+        if self._inverse is None:
+            self._inverse = type(self)({v: k for k, v in self.mapping.items()})
+            self._inverse._inverse = self
+        return self._inverse
 
     def __str__(self):
         """
@@ -169,6 +199,16 @@ class Perm:
                 " ".join(str(k).rjust(l) for k, l in zip(keys, kv_lengths)),
                 " ".join(str(v).rjust(l) for v, l in zip(values, kv_lengths)))
 
+    def translate(self, text):
+        """
+        Apply the permutation to every character of a string (so this only makes
+        sense for permutations of characters). This uses str.translate, which is
+        much quicker than looking up each character in turn.
+        """
+        if self._translation is None:
+            self._translation = str.maketrans(self.mapping)
+        return text.translate(self._translation)
+
     def __getitem__(self, item):
         """
         Use lookup syntax to apply the permutation to an element.
@@ -183,42 +223,57 @@ class Perm:
         resulting permutation should be inferred, but I'm using the convention
         that the domain stays as big as possible, which hopefully avoids
         forgetting anything important
+
+        Anything not moved by `other` just goes wherever `self` sends it, so
+        this starts from a copy of `self` and then only looks at the domain of
+        `other`.
         """
-        return type(self)({a: self[other[a]]
-                           for a in set(self.mapping) | set(other.mapping)})
+        mapping = self.mapping.copy()
+        self_get = self.mapping.get
+        mapping.update({a: self_get(b, b) for a, b in other.mapping.items()})
+        return type(self)(mapping)
+
+    def order(self):
+        """
+        The order of the permutation in the group-theoretic sense, ie the
+        smallest n > 0 such that self ** n is the identity. This is the lowest
+        common multiple of the cycle lengths.
+        """
+        # math.lcm would be nice here but that's 3.9+
+        return reduce(lambda a, b: a * b // gcd(a, b),
+                      map(len, self.cycles()), 1)
 
     def __pow__(self, n):
         """
         Exponent of a permutation, in the standard group-theoretic sense.
-        Probably it's O(k * log(n))-ish where k is the size of the domain, and n
-        is the exponent, as it uses exponentiation by squaring.
-
-        Possibly it's worth thinking about the asymptotic improvement brought by
-        calculating the order of the permutation and taking n mod ord(g) (in
-        fact asymptotically the time is then independent of n) but this is
-        probably too theoretical to be useful.
-
-        Supports negative exponents in the standard inverse sense.
-        """
-        if n < 0:
-            return self.inverse() ** (-n)
-        # Some hardcoded cases to avoid faffing around too much in the leaves of
-        # the tree (and lets me write ** 2 in the recursive step, so the
-        # auxiliary variable gets brushed under the recursion)
-        if n == 0:
-            return type(self)({})
-        if n == 1:
-            return self
-        if n == 2:
-            return self * self
-        exp_by_sqr = (self ** (n // 2)) ** 2
-        if n & 1:
-            return self * exp_by_sqr
-        return exp_by_sqr
+
+        Raising to the n moves each element n places along its cycle, so this
+        reads the result straight off the disjoint cycle decomposition. This is
+        O(k) where k is the size of the domain, regardless of n.
+
+        Supports negative exponents in the standard inverse sense (Python's %
+        always gives a non-negative shift, so these are just shifts backwards).
+
+        The result has the same domain as this permutation, like with __mul__.
+        """
+        # fixed points aren't in any cycle, so start from the identity on the
+        # whole domain so that they don't get lost
+        mapping = {a: a for a in self.mapping}
+        for cycle in self.cycles():
+            shift = n % len(cycle)
+            mapping.update(zip(cycle, cycle[shift:] + cycle[:shift]))
+        return type(self)(mapping)
 
     def __eq__(self, other):
         """
         Test for equality: all items map to the same thing.
+
+        Mappings which are exactly equal are checked for in one go (dict
+        comparison is done in C). Otherwise they could still differ just in
+        which fixed points they list, so the slower element-wise check is
+        needed.
         """
+        if self.mapping == other.mapping:
+            return True
         return (all(sa == other[a] for a, sa in self.mapping.items())
                 and all(oa == self[a] for a, oa in other.mapping.items()))
@@ -5,13 +5,23 @@ Utilities for use throughout. Mostly to do with stripping text and reading
 files.
 """
 
-# TODO: probably it's faster to just read it all into memory. We're almost
-#       invariably dealing with tiny, tiny files.
-def file_chars(file):
+import string
+import itertools
+
+# For ASCII, "letters" are unambiguous, so stripping can be done with a single
+# call to str.translate
+_ASCII_STRIP_TABLE = str.maketrans(
+        string.ascii_lowercase, string.ascii_uppercase,
+        "".join(c for c in map(chr, range(128))
+                if c not in string.ascii_letters))
+
+
+def file_chars(file, size=1 << 16):
     """
-    Generate the characters in a file one by one
+    Generate the characters in a file one by one. The file is read in blocks of
+    `size` characters, so this stays lazy for huge inputs (or stdin).
     """
-    return iter(lambda: file.read(1), "")
+    return itertools.chain.from_iterable(iter(lambda: file.read(size), ""))
 
 
 # TODO: try to do something with stripping accents from Unicode characters with
@@ -19,11 +29,20 @@ def file_chars(file):
 #       str.uppers means that because Python is very good at
 #       internationalisation, if you have plaintext or keys with wéïrd unicode
 #       characters in, things will probably break.
-#
-#       An improvement for now would be to just re-write this explicitly talking
-#       about ASCII characters a-z and A-Z.
 def strip_punc(gen):
     """
     Remove all but the letters and make them uppercase
+
+    If given a string, a string is returned, and this is done in bulk (with
+    str.translate for pure ASCII). Any other iterable of characters is stripped
+    lazily, and an iterator of characters is returned.
+
+    Either way, a letter whose uppercase is longer comes out as several
+    characters (eg "ß" becomes "S", "S").
     """
-    return map(str.upper, filter(str.isalpha, gen))
+    if isinstance(gen, str):
+        if gen.isascii():
+            return gen.translate(_ASCII_STRIP_TABLE)
+        return "".join(filter(str.isalpha, gen)).upper()
+    return itertools.chain.from_iterable(
+            map(str.upper, filter(str.isalpha, gen)))
@@ -45,6 +45,11 @@ class TestAutoPerm(unittest.TestCase):
         self.assertEqual(Perm(dict(zip(string.ascii_uppercase,
                                        "ZEBRACDFGHIJKLMNOPQSTUVWXY"))),
                          permutation_from_key("zebra"))
+        # letters outside A-Z are ignored
+        self.assertEqual(Perm(), permutation_from_key("é"))
+        self.assertEqual(permutation_from_key("zbr"),
+                         permutation_from_key("zébrà"))
+        self.assertTrue(permutation_from_key("Ça, c'est ça").is_permutation())
         for _ in range(100):
             key = "".join(random.choices(string.ascii_uppercase,
                                          k=random.randrange(30)))
@@ -70,6 +75,29 @@ class TestAutoPerm(unittest.TestCase):
         self.assertEqual(list(autoperm_decipher.func("", sigma, tau)), [])
         self.assertEqual(list(autoperm_decipher.func("B", sigma, tau)), ["A"])
 
+    # the ciphers update their keys in place rather than composing Perms, so
+    # check that this agrees with the definition
+    def test_agrees_with_composition(self):
+        for _ in range(20):
+            sigma = Perm.random(string.ascii_uppercase)
+            tau = Perm.random(string.ascii_uppercase)
+            plaintext = random.choices(string.ascii_uppercase,
+                                       k=random.randrange(100))
+            expected = []
+            sigma_i, tau_i = sigma, tau
+            for i in range(0, len(plaintext), 2):
+                a, *rest = plaintext[i:i + 2]
+                expected.append(sigma_i[a])
+                for b in rest:
+                    expected.append(tau_i[b])
+                    transposition = Perm.from_cycle([a, b])
+                    sigma_i *= transposition
+                    tau_i *= transposition
+            ciphertext = list(autoperm_encipher.func(plaintext, sigma, tau))
+            self.assertEqual(ciphertext, expected)
+            self.assertEqual(list(autoperm_decipher.func(expected, sigma, tau)),
+                             plaintext)
+
     # this tests integrated functionality of the whole module. Probably doesn't
     # belong in a unit test suite, but oh well.
     #
@@ -95,7 +123,7 @@ class TestAutoPerm(unittest.TestCase):
             ciphertext = io.StringIO()
             decrypted_plaintext = io.StringIO()
             autoperm_encipher.preserve(plaintext, ciphertext, sigma, tau)
-            ciphertext = io.StringIO(ciphertext.getvalue())
+            ciphertext.seek(0)
             autoperm_decipher.preserve(ciphertext, decrypted_plaintext,
                                        sigma, tau)
             self.assertEqual(decrypted_plaintext.getvalue(), data)
@@ -10,32 +10,35 @@ import io
 import random
 import textwrap as tw
 
-from autoperm.cipher_streamer import CipherStreamer, chunk, get_lines
+from autoperm.cipher_streamer import (CipherStreamer, chunk, get_lines,
+                                      match_case, write_batched)
 
 
-# generators for use in TestCipherStreamer
+# generators for use in TestCipherStreamer. Where possible these work on the
+# whole text at once rather than going character by character.
 @CipherStreamer
 def unchanged(text):
-    for c in text:
-        yield c
+    yield from text
 
 
 @CipherStreamer
 def to_upper(text):
-    for c in text:
-        yield c.upper()
+    yield from "".join(text).upper()
 
 
 @CipherStreamer
 def to_lower(text):
-    for c in text:
-        yield c.lower()
+    yield from "".join(text).lower()
 
 
 @CipherStreamer
 def to_random(text):
-    for c in text:
-        if random.random() < 0.5:
+    text = "".join(text)
+    # one random bit per character decides its case (getrandbits(0) is only
+    # allowed from 3.9)
+    bits = random.getrandbits(len(text)) if text else 0
+    for i, c in enumerate(text):
+        if bits >> i & 1:
             yield c.lower()
         else:
             yield c.upper()
@@ -43,15 +46,12 @@ def to_random(text):
 
 @CipherStreamer
 def to_exes(text):
-    for _ in text:
-        yield "X"
+    yield from "X" * len("".join(text))
 
 
 @CipherStreamer
 def extra_exes(text):
-    for _ in text:
-        yield "X"
-        yield "X"
+    yield from "XX" * len("".join(text))
 
 
 @CipherStreamer
@@ -60,35 +60,37 @@ def not_enough_exes(_):
 
 
 class TestCipherStreamer(unittest.TestCase):
-    def setUp(self):
-        self.preservative_generators = [
+    # the fixture strings never change, so only dedent them once
+    @classmethod
+    def setUpClass(cls):
+        cls.preservative_generators = [
                 unchanged, to_upper, to_lower, to_random]
-        self.generators = [
-                *self.preservative_generators,
+        cls.generators = [
+                *cls.preservative_generators,
                 to_exes, extra_exes, not_enough_exes]
-        self.input_text = '"Sphinx (of black quartz), judge my vow!?";'
-        self.input_stripped = "SPHINXOFBLACKQUARTZJUDGEMYVOW\n"
-        self.input_stripped_compare = tw.dedent("""\
+        cls.input_text = '"Sphinx (of black quartz), judge my vow!?";'
+        cls.input_stripped = "SPHINXOFBLACKQUARTZJUDGEMYVOW\n"
+        cls.input_stripped_compare = tw.dedent("""\
                 i:SPHINXOFBLACKQUARTZJUDGEMYVOW
                 o:XXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
                 """)
-        self.input_stripped_compare_short = tw.dedent("""\
+        cls.input_stripped_compare_short = tw.dedent("""\
                 i:SPHINXOFBLACKQUARTZJUDGEMYVOW
                 o:XXX
 
                 """)
-        self.input_stripped_compare_extra = tw.dedent("""\
+        cls.input_stripped_compare_extra = tw.dedent("""\
                 i:SPHINXOFBLACKQUARTZJUDGEMYVOW
                 o:XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
                 """)
-        self.input_blocks_lines = tw.dedent("""\
+        cls.input_blocks_lines = tw.dedent("""\
                 SPHIN XOFBL
                 ACKQU ARTZJ
                 UDGEM YVOW
                 """)
-        self.input_blocks_lines_compare = tw.dedent("""\
+        cls.input_blocks_lines_compare = tw.dedent("""\
                 i:SPHIN XOFBL
                 o:XXXXX XXXXX
 
@@ -99,7 +101,7 @@ class TestCipherStreamer(unittest.TestCase):
                 o:XXXXX XXXX
 
                 """)
-        self.input_blocks_lines_compare_short = tw.dedent("""\
+        cls.input_blocks_lines_compare_short = tw.dedent("""\
                 i:SPHIN XOFBL
                 o:XXX
 
@@ -110,7 +112,7 @@ class TestCipherStreamer(unittest.TestCase):
                 o:
 
                 """)
-        self.input_blocks_lines_compare_extra = tw.dedent("""\
+        cls.input_blocks_lines_compare_extra = tw.dedent("""\
                 i:SPHIN XOFBL
                 o:XXXXX XXXXX
 
@@ -130,12 +132,12 @@ class TestCipherStreamer(unittest.TestCase):
                 o:XXXXX XXX
 
                 """)
-        self.input_lines = tw.dedent("""\
+        cls.input_lines = tw.dedent("""\
                 SPHINXOFBL
                 ACKQUARTZJ
                 UDGEMYVOW
                 """)
-        self.input_lines_compare = tw.dedent("""\
+        cls.input_lines_compare = tw.dedent("""\
                 i:SPHINXOFBL
                 o:XXXXXXXXXX
 
@@ -146,7 +148,7 @@ class TestCipherStreamer(unittest.TestCase):
                 o:XXXXXXXXX
 
                 """)
-        self.input_lines_compare_short = tw.dedent("""\
+        cls.input_lines_compare_short = tw.dedent("""\
                 i:SPHINXOFBL
                 o:XXX
 
@@ -157,7 +159,7 @@ class TestCipherStreamer(unittest.TestCase):
                 o:
 
                 """)
-        self.input_lines_compare_extra = tw.dedent("""\
+        cls.input_lines_compare_extra = tw.dedent("""\
                 i:SPHINXOFBL
                 o:XXXXXXXXXX
 
@@ -177,18 +179,18 @@ class TestCipherStreamer(unittest.TestCase):
                 o:XXXXXXXX
 
                 """)
-        self.input_blocks = "SPHIN XOFBL ACKQU ARTZJ UDGEM YVOW\n"
-        self.input_blocks_compare = tw.dedent("""\
+        cls.input_blocks = "SPHIN XOFBL ACKQU ARTZJ UDGEM YVOW\n"
+        cls.input_blocks_compare = tw.dedent("""\
                 i:SPHIN XOFBL ACKQU ARTZJ UDGEM YVOW
                 o:XXXXX XXXXX XXXXX XXXXX XXXXX XXXX
 
                 """)
-        self.input_blocks_compare_short = tw.dedent("""\
+        cls.input_blocks_compare_short = tw.dedent("""\
                 i:SPHIN XOFBL ACKQU ARTZJ UDGEM YVOW
                 o:XXX
 
                 """)
-        self.input_blocks_compare_extra = tw.dedent("""\
+        cls.input_blocks_compare_extra = tw.dedent("""\
                 i:SPHIN XOFBL ACKQU ARTZJ UDGEM YVOW
                 o:XXXXX XXXXX XXXXX XXXXX XXXXX XXXXX
 
@@ -196,9 +198,20 @@ class TestCipherStreamer(unittest.TestCase):
                 o:XXXXX XXXXX XXXXX XXXXX XXXXX XXX
 
                 """)
+
+    def setUp(self):
         self.input_file = io.StringIO(self.input_text)
         self.output_file = io.StringIO()
 
+    def reset_files(self):
+        """
+        Rewind the input and empty the output, so the same files can be used
+        again within a test
+        """
+        self.input_file.seek(0)
+        self.output_file.seek(0)
+        self.output_file.truncate()
+
     def test_chunk(self):
         self.assertEqual(list(chunk([], 1)), [])
         self.assertEqual(list(chunk([], 2)), [])
@@ -209,6 +222,40 @@ class TestCipherStreamer(unittest.TestCase):
         self.assertEqual(list(chunk(range(4), 3, 4)),
                          [(0, 1, 2), (3, 4, 4)])
 
+    def test_write_batched(self):
+        class LoggingFile(io.StringIO):
+            def __init__(self):
+                super().__init__()
+                self.writes = []
+
+            def write(self, s):
+                self.writes.append(s)
+                return super().write(s)
+
+        pieces = ["ab", "c", "", "defg", "h"]
+        for size in range(1, 10):
+            out_file = LoggingFile()
+            write_batched(out_file, pieces, size)
+            self.assertEqual(out_file.getvalue(), "abcdefgh")
+            self.assertTrue(all(len(s) >= size for s in out_file.writes[:-1]))
+        out_file = LoggingFile()
+        write_batched(out_file, pieces)
+        self.assertEqual(out_file.writes, ["abcdefgh"])
+        out_file = LoggingFile()
+        write_batched(out_file, [])
+        self.assertEqual(out_file.getvalue(), "")
+
+    def test_match_case(self):
+        for text, pattern, result in (("", "", ""),
+                                      ("xyz", "ABC", "XYZ"),
+                                      ("XYZ", "abc", "xyz"),
+                                      ("xyz", "Abc", "Xyz"),
+                                      ("xyz", "aBc", "xYz"),
+                                      ("XY", "ABC", "XY"),
+                                      ("xY", "Abc", "Xy"),
+                                      ("xyz", "ÀbC", "XyZ")):
+            self.assertEqual(match_case(text, pattern), result)
+
     def test_call(self):
         for g in self.generators:
             self.assertRaises(TypeError, g)
@@ -217,22 +264,35 @@ class TestCipherStreamer(unittest.TestCase):
 
     def test_preserve(self):
         for g in self.preservative_generators:
-            self.setUp()
+            self.reset_files()
             g.preserve(self.input_file, self.output_file)
             self.assertEqual(self.input_text, self.output_file.getvalue())
-            self.setUp()
+            self.reset_files()
             g.preserve(io.StringIO(), self.output_file)
             self.assertEqual("", self.output_file.getvalue())
-        self.setUp()
+        # letters which get longer when uppercased shouldn't push output past
+        # the trailing punctuation
+        self.reset_files()
+        unchanged.preserve(io.StringIO("Straße!\n"), self.output_file)
+        self.assertEqual("Strasse!\n", self.output_file.getvalue())
+        self.reset_files()
+        to_exes.preserve(io.StringIO("STRAßE, ß!\n"), self.output_file)
+        self.assertEqual("XXXXxxX, xx!\n", self.output_file.getvalue())
+        # non-ASCII text is split up differently
+        for text in "Ça va? Très bien.\n", "naïve", "¿Qué?":
+            self.reset_files()
+            unchanged.preserve(io.StringIO(text), self.output_file)
+            self.assertEqual(text, self.output_file.getvalue())
+        self.reset_files()
         to_exes.preserve(self.input_file, self.output_file)
         self.assertEqual(self.output_file.getvalue(),
                          '"Xxxxxx (xx xxxxx xxxxxx), xxxxx xx xxx!?";')
-        self.setUp()
+        self.reset_files()
         extra_exes.preserve(self.input_file, self.output_file)
         self.assertEqual(self.output_file.getvalue(),
                          ('"Xxxxxx (xx xxxxx xxxxxx), xxxxx xx xxx!?";'
                           'XXXXXXXXXXXXXXXXXXXXXXXXXXXXX'))
-        self.setUp()
+        self.reset_files()
         not_enough_exes.preserve(self.input_file, self.output_file)
         self.assertEqual(self.output_file.getvalue(),
                          '"Xxx (  ),   !?";')
@@ -244,68 +304,92 @@ class TestCipherStreamer(unittest.TestCase):
         self.assertEqual(list(get_lines("", block=1, width=0)), [""])
         self.assertEqual(list(get_lines("", block=0, width=1)), [])
         self.assertEqual(list(get_lines("", block=1, width=1)), [])
-        self.assertEqual(list(get_lines(self.input_stripped.strip(),
-                                        block=0, width=0)),
-                         self.input_stripped.strip().split("\n"))
-        self.assertEqual(list(get_lines(self.input_stripped.strip(),
-                                        block=5, width=0)),
+        stripped = self.input_stripped.strip()
+        blocks_lines = self.input_blocks_lines.strip().split("\n")
+        self.assertEqual(list(get_lines(stripped, block=0, width=0)),
+                         stripped.split("\n"))
+        self.assertEqual(list(get_lines(stripped, block=5, width=0)),
                          self.input_blocks.strip().split("\n"))
-        self.assertEqual(list(get_lines(self.input_stripped.strip(),
-                                        block=0, width=10)),
+        self.assertEqual(list(get_lines(stripped, block=0, width=10)),
                          self.input_lines.strip().split("\n"))
         for width in range(11, 17):
-            self.assertEqual(
-                    list(get_lines(self.input_stripped.strip(),
-                                   block=5, width=width)),
-                    self.input_blocks_lines.strip().split("\n"))
+            self.assertEqual(list(get_lines(stripped, block=5, width=width)),
+                             blocks_lines)
         for width in 10, 17:
             self.assertNotEqual(
-                    list(get_lines(self.input_stripped.strip(),
-                                   block=5, width=width)),
-                    self.input_blocks_lines.strip().split("\n"))
+                    list(get_lines(stripped, block=5, width=width)),
+                    blocks_lines)
+
+    def test_get_lines_str(self):
+        # strings are handled separately, but should come out the same
+        # (including ones with spaces in, which get stripped off each line)
+        for text in ("", "A", "ABCDEFGHIJ", self.input_stripped.strip(),
+                     " AB CD", "AB  CD "):
+            for block in range(-1, 7):
+                for width in range(-1, 14):
+                    if 0 < width < block:
+                        self.assertRaises(ValueError, get_lines, text, block,
+                                          width)
+                        continue
+                    self.assertEqual(list(get_lines(text, block, width)),
+                                     list(get_lines(iter(text), block, width)))
 
     def test_strip(self):
         # Also test the lowercase version in each case, with a nice D.R.Y loop
         for lowercase, case_func in ((True, str.lower), (False, lambda s: s)):
             for g in self.preservative_generators:
-                self.setUp()
+                self.reset_files()
                 g.strip(self.input_file, self.output_file, block=0, width=0,
                         lowercase=lowercase)
                 self.assertEqual(case_func(self.input_stripped),
                                  self.output_file.getvalue())
-                self.setUp()
+                self.reset_files()
                 g.strip(self.input_file, self.output_file, block=5, width=0,
                         lowercase=lowercase)
                 self.assertEqual(case_func(self.input_blocks),
                                  self.output_file.getvalue())
-                self.setUp()
+                self.reset_files()
                 g.strip(self.input_file, self.output_file, block=0, width=10,
                         lowercase=lowercase)
                 self.assertEqual(case_func(self.input_lines),
                                  self.output_file.getvalue())
+                blocks_lines = case_func(self.input_blocks_lines)
                 for width in range(11, 17):
-                    self.setUp()
+                    self.reset_files()
                     g.strip(self.input_file, self.output_file, block=5,
                             width=width, lowercase=lowercase)
-                    self.assertEqual(case_func(self.input_blocks_lines),
-                                     self.output_file.getvalue())
+                    self.assertEqual(blocks_lines, self.output_file.getvalue())
                 for width in 10, 17:
-                    self.setUp()
+                    self.reset_files()
                     g.strip(self.input_file, self.output_file, block=5,
                             width=width, lowercase=lowercase)
-                    self.assertNotEqual(case_func(self.input_blocks_lines),
+                    self.assertNotEqual(blocks_lines,
                                         self.output_file.getvalue())
+            # letters which get longer when uppercased are stripped to all of
+            # their uppercase letters
+            self.reset_files()
+            unchanged.strip(io.StringIO("Straße"), self.output_file, block=3,
+                            width=0, compare=True, lowercase=lowercase)
+            self.assertEqual(case_func("i:STR ASS E\no:STR ASS E\n\n"),
+                             self.output_file.getvalue())
+            # case mappings which change the length of the text shouldn't
+            # throw off the blocks ("İ".lower() is two characters)
+            self.reset_files()
+            unchanged.strip(io.StringIO("abİcd"), self.output_file, block=3,
+                            width=7, lowercase=lowercase)
+            self.assertEqual(case_func("ABİ CD\n"),
+                             self.output_file.getvalue())
             # a bit of meta-hackery here to make things more concise. I think
             # it's forgiveable if it's in testing code anyway
             for g, postfix in ((to_exes, ""),
                                (not_enough_exes, "_short"),
                                (extra_exes, "_extra")):
-                self.setUp()
+                self.reset_files()
                 g.strip(self.input_file, self.output_file, block=0, width=0,
                         compare=True, lowercase=lowercase)
                 self.assertEqual(
-                        case_func(vars(self)[
-                            "input_stripped_compare{}".format(postfix)]),
+                        case_func(getattr(
+                            self, "input_stripped_compare{}".format(postfix))),
                         self.output_file.getvalue())
 
 
@@ -15,8 +15,9 @@ from math import inf
 from autoperm.util import strip_punc
 
 from autoperm.metric import (
-        BEE_MOVIE, blind_distribution, normalise, chi_squared, Metric, ioc,
-        frequency_goodness_of_fit, blind_frequency_fit)
+        BEE_MOVIE, BEE_MOVIE_STRIPPED, blind_distribution, normalise,
+        letter_counts, chi_squared, Metric, ioc, frequency_goodness_of_fit,
+        blind_frequency_fit)
 
 ALL_ONES_SENTINEL = object()
 WANTS_ARGUMENTS_SENTINEL = object()
@@ -62,6 +63,11 @@ class TestMetric(unittest.TestCase):
                         collections.Counter(strip_punc(BEE_MOVIE))).values()),
                 1)
 
+    def test_letter_counts(self):
+        for text in ("", "A", "AAB", "ÀAB", "a b", [1, 2, 2],
+                     strip_punc(BEE_MOVIE), BEE_MOVIE):
+            self.assertEqual(letter_counts(text), collections.Counter(text))
+
     def test_chi_squared(self):
         self.assertEqual(chi_squared({1: 0.2, 2: 0.8}, {1: 0.2, 2: 0.8}), 0)
         # exercise for the reader: prove this pattern holds in general
@@ -123,7 +129,10 @@ class TestMetric(unittest.TestCase):
 
     def test_metric_english(self):
         all_ones.english()
-        counts_input_size.english()
+        self.assertEqual(BEE_MOVIE_STRIPPED, strip_punc(BEE_MOVIE))
+        self.assertEqual(counts_input_size.english(),
+                         counts_input_size(BEE_MOVIE))
+        self.assertEqual(ioc.english(), ioc(BEE_MOVIE))
 
     def test_ioc(self):
         # see test_chi_squared for why this is Equal rather than AlmostEqual
@@ -131,6 +140,9 @@ class TestMetric(unittest.TestCase):
         self.assertEqual(ioc("a"), 0)
         self.assertEqual(ioc("ab"), 0)
         self.assertEqual(ioc("aa"), 26)
+        # "ß" is stripped to "SS"
+        self.assertEqual(ioc("ß"), 26)
+        self.assertEqual(ioc(iter("ß")), 26)
         self.assertEqual(ioc(string.ascii_uppercase), 0)
         self.assertAlmostEqual(ioc(string.ascii_uppercase * 2), 26 / 51)
         self.assertAlmostEqual(ioc(string.ascii_uppercase * 3), 2 * 26 / 77)
@@ -16,39 +16,42 @@ import itertools
 
 from functools import reduce
 from operator import mul
-from random import sample
+from random import choices, sample
 from collections import OrderedDict
 
 from autoperm.perm import Perm
 
 
 class TestPerm(unittest.TestCase):
-    def setUp(self):
-        self.perm6 = Perm({1: 2, 2: 1, 3: 3, 4: 5, 5: 6, 6: 4})
-        self.operm = Perm({})
-        self.permoc = Perm.from_cycle([])
-        self.perm1c = Perm.from_cycle([1])
-        self.perm2c = Perm.from_cycle([1, 2])
-        self.perm3c = Perm.from_cycle([1, 2, 3])
+    # Perms are immutable, so the tests can share one library of them, built
+    # once for the whole class rather than before every test
+    @classmethod
+    def setUpClass(cls):
+        cls.perm6 = Perm({1: 2, 2: 1, 3: 3, 4: 5, 5: 6, 6: 4})
+        cls.operm = Perm({})
+        cls.permoc = Perm.from_cycle([])
+        cls.perm1c = Perm.from_cycle([1])
+        cls.perm2c = Perm.from_cycle([1, 2])
+        cls.perm3c = Perm.from_cycle([1, 2, 3])
         # huge list of hopefully lots of different kinds of permutation covering
         # lots of edge cases
-        self.reg_perms = [
-                self.permoc, self.perm1c, self.perm2c, self.perm3c,
+        cls.reg_perms = [
+                cls.permoc, cls.perm1c, cls.perm2c, cls.perm3c,
                 *(Perm.from_cycle(range(j, j + i)) for i in range(4, 9)
                                                    for j in range(9 - i)),
                 *(Perm.from_cycle(range(j, j + i)[::-1]) for i in range(2, 9)
                                                          for j in range(9 - i)
                                                          ),
-                self.operm, self.perm6]
+                cls.operm, cls.perm6]
         # add some more random permutations to hopefully catch more edge cases,
         # but keep them in a separate list so I can also access a deterministic
         # list of permutations that I can guarantee properties of
-        self.perms = [
-                *self.reg_perms,
+        cls.perms = [
+                *cls.reg_perms,
                 *(Perm.random(range(i)) for i in range(4, 20))]
         for _ in range(10):
-            a, b = sample(self.perms, 2)
-            self.perms.append(a * b)
+            a, b = sample(cls.perms, 2)
+            cls.perms.append(a * b)
 
     def test_is_permutation(self):
         for g in self.perms:
@@ -94,9 +97,11 @@ class TestPerm(unittest.TestCase):
                         Perm.from_cycle(list(range(i)) * j).is_permutation())
 
     def test_random(self):
-        # check valid permutations are given
+        # check valid permutations are given, on the right domain
         for i in range(100):
-            self.assertTrue(Perm.random(range(i)).is_permutation)
+            g = Perm.random(range(i))
+            self.assertTrue(g.is_permutation())
+            self.assertEqual(sorted(g.mapping), list(range(i)))
 
     def test_disjoint_cycle_decomposition(self):
         self.assertEqual(Perm().disjoint_cycle_decomposition_stable(), [])
@@ -104,6 +109,11 @@ class TestPerm(unittest.TestCase):
                          [[1, 2], [4, 5, 6]])
         self.assertEqual(self.perm3c.disjoint_cycle_decomposition_stable(),
                          [[1, 2, 3]])
+        # key should be applied to the elements themselves
+        self.assertEqual(
+                self.perm6.disjoint_cycle_decomposition_stable(
+                    key=lambda x: -x),
+                [[2, 1], [6, 4, 5]])
         # reconstruct permutations as a cycle composition
         for g in self.perms:
             self.assertEqual(
@@ -119,6 +129,20 @@ class TestPerm(unittest.TestCase):
                            Perm()),
                     g)
 
+    def test_cycles(self):
+        self.assertEqual(Perm().cycles(), ())
+        self.assertEqual(self.perm1c.cycles(), ())
+        self.assertCountEqual(map(sorted, self.perm6.cycles()),
+                              [[1, 2], [4, 5, 6]])
+        for g in self.perms:
+            self.assertIs(g.cycles(), g.cycles())
+            self.assertEqual(list(map(list, g.cycles())),
+                             g.disjoint_cycle_decomposition_unstable())
+            # the lists handed out can be changed without affecting the cache
+            g.disjoint_cycle_decomposition_stable(key=lambda x: -x)
+            self.assertEqual(
+                    reduce(mul, map(Perm.from_cycle, g.cycles()), Perm()), g)
+
     def test_inverse(self):
         for g in self.perms:
             self.assertEqual(g.inverse().inverse(), g)
@@ -129,20 +153,25 @@ class TestPerm(unittest.TestCase):
         for g, h in itertools.product(self.perms, self.perms):
             self.assertEqual((g * h).inverse(), h.inverse() * g.inverse())
         self.assertEqual(Perm.from_cycle([3, 2, 1]).inverse(), self.perm3c)
+        # the inverse is only calculated once
+        for g in self.perms:
+            self.assertIs(g.inverse(), g.inverse())
+            self.assertIs(g.inverse().inverse(), g)
 
     def test_comp(self):
         for g in self.perms:
             self.assertEqual(g * g.inverse(), self.operm)
-        for g, h in itertools.product(self.perms, self.perms):
-            self.assertTrue((g * h).is_permutation())
-            # conjugates should preserve cycle type
-            conj = h * g * h.inverse()
-            self.assertCountEqual(
-                    list(map(len, g.disjoint_cycle_decomposition_unstable())),
-                    list(map(len,
-                             conj.disjoint_cycle_decomposition_unstable())))
-        # associativity of composition
-        for g, h, k in itertools.product(*[self.perms] * 3):
+        for g in self.perms:
+            cycle_type = sorted(map(len, g.cycles()))
+            for h in self.perms:
+                self.assertTrue((g * h).is_permutation())
+                # conjugates should preserve cycle type
+                conj = h * g * h.inverse()
+                self.assertEqual(cycle_type, sorted(map(len, conj.cycles())))
+        # associativity of composition. Checking every triple takes far too
+        # long, so check a decent random sample of them instead
+        for _ in range(2000):
+            g, h, k = choices(self.perms, k=3)
             self.assertEqual((g * h) * k, g * (h * k))
         self.assertEqual(Perm.from_cycle([4, 5, 6]) * self.perm6,
                          Perm({1: 2, 2: 1, 4: 6, 5: 4, 6: 5}))
@@ -165,9 +194,10 @@ class TestPerm(unittest.TestCase):
                 self.assertEqual(g ** (-n), prod.inverse())
                 prod *= g
             # check if cyclic subgroup generated by g is abelian :)
+            powers = {n: g ** n for n in range(-20, 20)}
             for a in range(-10, 10):
                 for b in range(-10, 10):
-                    self.assertEqual(g ** a * g ** b, g ** (a + b))
+                    self.assertEqual(powers[a] * powers[b], powers[a + b])
             self.assertEqual(g ** -1, g.inverse())
             # check if the order divides the LCM of cycle lengths
             order = reduce(mul,
@@ -175,8 +205,27 @@ class TestPerm(unittest.TestCase):
                                g.disjoint_cycle_decomposition_unstable()),
                            1)
             self.assertEqual(g ** order, self.operm)
+        # powers keep the whole domain, fixed points included
+        for n in range(-3, 4):
+            self.assertEqual((self.perm6 ** n).mapping.keys(),
+                             self.perm6.mapping.keys())
+        self.assertEqual((Perm({1: 2, 2: 1, 3: 3}) ** 1).mapping,
+                         {1: 2, 2: 1, 3: 3})
         self.assertEqual(Perm.from_cycle(range(10)) ** 9,
                          Perm.from_cycle(range(10)).inverse())
+        self.assertEqual(self.perm6 ** 1000001, Perm({1: 2, 2: 1, 4: 6, 5: 4,
+                                                      6: 5}))
+
+    def test_order(self):
+        self.assertEqual(self.operm.order(), 1)
+        self.assertEqual(self.perm2c.order(), 2)
+        self.assertEqual(self.perm3c.order(), 3)
+        self.assertEqual(self.perm6.order(), 6)
+        for g in self.perms:
+            order = g.order()
+            self.assertEqual(g ** order, self.operm)
+            for n in range(1, order):
+                self.assertNotEqual(g ** n, self.operm)
 
     def test_lookup(self):
         for g in self.perms:
@@ -186,6 +235,15 @@ class TestPerm(unittest.TestCase):
             for item in g.mapping:
                 self.assertEqual(g.mapping[item], g[item])
 
+    def test_translate(self):
+        self.assertEqual(Perm().translate("ABC"), "ABC")
+        self.assertEqual(Perm.from_cycle("ABC").translate(""), "")
+        self.assertEqual(Perm.from_cycle("ABC").translate("AAB?XC"), "BBC?XA")
+        g = Perm.from_cycle("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+        text = "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG"
+        self.assertEqual(g.translate(text), "".join(g[c] for c in text))
+        self.assertEqual(g.inverse().translate(g.translate(text)), text)
+
     def test_str(self):
         for g in self.perms:
             str(g)
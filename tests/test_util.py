@@ -18,16 +18,25 @@ class TestUtil(unittest.TestCase):
                 ("ABC", "ABC"),
                 ("abc", "ABC"),
                 ("aBc", "ABC"),
-                (",A987B^&*C*", "ABC")]
+                (",A987B^&*C*", "ABC"),
+                ("\tÀb-ç\n", "ÀBÇ"),
+                ("Straße", "STRASSE")]
 
     def test_file_chars(self):
         for input_text, _ in self.strings:
             self.assertEqual("".join(file_chars(io.StringIO(input_text))),
                              input_text)
+            # make sure block boundaries don't lose anything
+            for size in 1, 2, 3:
+                self.assertEqual(
+                        "".join(file_chars(io.StringIO(input_text), size)),
+                        input_text)
 
     def test_strip_punc(self):
         for input_text, result in self.strings:
-            self.assertEqual("".join(strip_punc(input_text)), result)
+            self.assertEqual(strip_punc(input_text), result)
+            # also the lazy version, which should give the same characters
+            self.assertEqual(list(strip_punc(iter(input_text))), list(result))
 
 
 if __name__ == "__main__":